@@ -0,0 +1,4 @@
+from nbedit.cli import cli
+
+# `python -m nbedit ...` behaves like the nbedit console script
+cli()
@@ -389,6 +389,16 @@ class EditorManagerContentSelection {
 ///////////////////////////////////// COMMAND PALLETE /////////////////////////////////
 ///////////////////////////////////////////////////////////////////////////////////////
 
+// Stable per-browser id so the server can keep per-user prompt stats
+function nbeditUserId() {
+    let userId = localStorage.getItem('nbedit.userId');
+    if (!userId) {
+        userId = (crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random()}`);
+        localStorage.setItem('nbedit.userId', userId);
+    }
+    return userId;
+}
+
 class AIManagerResult {
     constructor(
         mng_ctx_sel,
@@ -481,36 +491,43 @@ class AIManagerResult {
         this.closeResultModal();
     };
 
-    processTextWithAPI = async (text, command) => {
-        try {
-            const contextBefore = this.mng_ctx_sel.getContextBefore();
-            const contextAfter = this.mng_ctx_sel.getContextAfter();
+    requestProcess = async (text, prompt, { attempt = 1, speculative = false, speculativeId = null, signal } = {}) => {
+        const contextBefore = this.mng_ctx_sel.getContextBefore();
+        const contextAfter = this.mng_ctx_sel.getContextAfter();
+
+        const response = await fetch('/api/process', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'X-Nbedit-User': nbeditUserId() },
+            body: JSON.stringify({
+                text,
+                prompt,
+                attempt,
+                speculative,
+                speculative_id: speculativeId,
+                context: { before: contextBefore, after: contextAfter },
+            }),
+            signal,
+        });
 
-            const response = await fetch('/api/process', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    text,
-                    prompt: command.customPrompt,
-                    attempt: this.state.attempts || 1,
-                    context: { before: contextBefore, after: contextAfter },
-                }),
-            });
+        if (!response.ok) {
+            const errorData = await response.json();
+            throw new Error(errorData.message || errorData.error || 'API request failed');
+        }
 
-            if (!response.ok) {
-                const errorData = await response.json();
-                throw new Error(errorData.message || 'API request failed');
-            }
+        const data = await response.json();
+        return data.result;
+    };
 
-            const data = await response.json();
-            return data.result;
+    processTextWithAPI = async (text, command) => {
+        try {
+            return await this.requestProcess(text, command.customPrompt, { attempt: this.state.attempts || 1 });
         } catch (error) {
             console.error('API Error:', error);
             return `[API Error: ${error.message}]\n\nFallback response for "${command.customPrompt}"`;
         }
     };
 
-    executeCommand = async (command, selectedText, selectionStart, selectionEnd) => {
+    executeCommand = async (command, selectedText, selectionStart, selectionEnd, prefetched = null) => {
         this.state.command = command;
         this.state.attempts = 1;
         this.state.selectedText = selectedText;
@@ -521,7 +538,11 @@ class AIManagerResult {
         this.mng_ctx_sel.maintainSelection();
 
         try {
-            const result = await this.processTextWithAPI(selectedText, command);
+            // A speculative result (already resolved or still in flight) replaces the API call;
+            // if it failed or got cancelled fall back to a regular request
+            const result = prefetched
+                ? await prefetched.catch(() => this.processTextWithAPI(selectedText, command))
+                : await this.processTextWithAPI(selectedText, command);
             this.showResultModal(result);
             this.mng_ctx_sel.maintainSelection();
         } catch (error) {
@@ -595,18 +616,134 @@ class AIManagerResult {
 
 ///////////////////////////////////////////////////////////////////////////////////////
 
+class AIManagerSpeculative {
+    constructor(mng_ai_result, maxSuggestions = 3, maxChars = 2000) {
+        if (!(mng_ai_result instanceof AIManagerResult)) {
+            throw new Error('AIManagerSpeculative: mng_ai_result must be an instance of AIManagerResult');
+        }
+
+        this.mng_ai_result = mng_ai_result;
+        this.maxSuggestions = maxSuggestions;  // prompts shown in the palette
+        this.maxChars = maxChars;              // budget: skip long selections
+        // How many of the shown prompts run speculatively is the server's budget
+
+        this.state = {
+            generation: 0,         // bumped on cancel, drops suggestions that arrive late
+            selectedText: '',
+            runs: new Map(),       // normalized prompt -> { run: Promise<result>, controller, runId }
+        };
+    }
+
+    static normalize = (prompt) => prompt.toLowerCase().split(/\s+/).filter(Boolean).join(' ');
+
+    fetchSuggestions = async () => {
+        const response = await fetch(`/api/prompt-suggestions?k=${this.maxSuggestions}`, {
+            headers: { 'X-Nbedit-User': nbeditUserId() },
+        });
+        if (!response.ok) {
+            throw new Error('Prompt suggestions request failed');
+        }
+        return response.json();
+    };
+
+    // Returns the user's top prompts and, budget permitting, starts low-priority runs for them
+    prefetch = async (selectedText) => {
+        // Let the server free the slots of the previous selection's runs first
+        const cancelled = this.cancel();
+        const generation = this.state.generation;
+
+        let data;
+        try {
+            await cancelled;
+            data = await this.fetchSuggestions();
+        } catch (error) {
+            console.error('Speculative prefetch failed:', error);
+            return [];
+        }
+        const prompts = data.suggestions.map((s) => s.prompt);
+
+        if (generation !== this.state.generation) {
+            return prompts; // palette closed or prompt submitted meanwhile
+        }
+        if (!data.speculative_budget || !selectedText || selectedText.length > this.maxChars) {
+            return prompts;
+        }
+
+        this.state.selectedText = selectedText;
+        for (const prompt of prompts.slice(0, data.speculative_budget)) {
+            const controller = new AbortController();
+            const runId = crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random()}`;
+            const run = this.mng_ai_result.requestProcess(selectedText, prompt, {
+                speculative: true,
+                speculativeId: runId,
+                signal: controller.signal,
+            });
+            run.catch(() => {}); // failures surface only if the run is picked
+            this.state.runs.set(AIManagerSpeculative.normalize(prompt), { run, controller, runId });
+        }
+        return prompts;
+    };
+
+    // Hand over the run matching prompt (or null) and cancel the rest
+    take = (prompt, selectedText) => {
+        const key = AIManagerSpeculative.normalize(prompt);
+        const entry = (selectedText === this.state.selectedText) ? this.state.runs.get(key) : undefined;
+        this.state.runs.delete(key);
+        this.cancel();
+        if (!entry) {
+            return null;
+        }
+        // The server only counts non-speculative /api/process calls, so report the pick once it
+        // is actually served; if the run failed, the fallback request is counted instead
+        return entry.run.then((result) => {
+            fetch('/api/prompt-usage', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json', 'X-Nbedit-User': nbeditUserId() },
+                body: JSON.stringify({ prompt }),
+            }).catch((error) => console.error('Prompt usage report failed:', error));
+            return result;
+        });
+    };
+
+    // Abort pending runs and tell the server to stop generating them
+    cancel = () => {
+        const runIds = [];
+        for (const { controller, runId } of this.state.runs.values()) {
+            controller.abort();
+            runIds.push(runId);
+        }
+        this.state.generation++;
+        this.state.selectedText = '';
+        this.state.runs.clear();
+
+        if (runIds.length === 0) {
+            return Promise.resolve();
+        }
+        return fetch('/api/speculative-cancel', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'X-Nbedit-User': nbeditUserId() },
+            body: JSON.stringify({ ids: runIds }),
+            keepalive: true,
+        }).catch((error) => console.error('Speculative cancel failed:', error));
+    };
+}
+
+///////////////////////////////////////////////////////////////////////////////////////
+
 class CommandPaletteManager {
     constructor(
         mng_ctx_sel,
         mng_ai_result,
+        mng_ai_speculative,
         commandPalette_elem,
         promptInput_elem,
         selectionPreview_elem,
         selectionPreviewContainer_elem,
+        promptSuggestions_elem,
     ) {
         EditorManagerContentSelection.assertInstance(mng_ctx_sel);
 
-        if (!commandPalette_elem || !promptInput_elem || !selectionPreview_elem || !selectionPreviewContainer_elem) {
+        if (!commandPalette_elem || !promptInput_elem || !selectionPreview_elem || !selectionPreviewContainer_elem || !promptSuggestions_elem) {
             throw new Error('CommandPaletteManager: Missing required DOM elements');
         }
 
@@ -615,7 +752,9 @@ class CommandPaletteManager {
         this.promptInput_elem = promptInput_elem;
         this.selectionPreview_elem = selectionPreview_elem;
         this.selectionPreviewContainer_elem = selectionPreviewContainer_elem;
+        this.promptSuggestions_elem = promptSuggestions_elem;
         this.mng_ai_result = mng_ai_result;
+        this.mng_ai_speculative = mng_ai_speculative;
 
         this.state = {
             selectedText: '',
@@ -633,12 +772,23 @@ class CommandPaletteManager {
                 e.preventDefault();
                 this.submitPrompt();
             } else if (e.key === 'Escape') {
+                this.mng_ai_speculative.cancel();
                 this.closeCommandPalette();
             }
         });
 
+        this.promptSuggestions_elem.addEventListener('click', (e) => {
+            const prompt = e.target.dataset.prompt;
+            if (prompt) {
+                e.stopPropagation();
+                this.promptInput_elem.value = prompt;
+                this.submitPrompt();
+            }
+        });
+
         document.addEventListener('click', (e) => {
             if (this.state.commandPalette.isOpen && !this.commandPalette_elem.contains(e.target)) {
+                this.mng_ai_speculative.cancel();
                 this.closeCommandPalette();
             }
         });
@@ -664,6 +814,26 @@ class CommandPaletteManager {
         this.promptInput_elem.value = '';
         this.commandPalette_elem.classList.remove('hidden');
         setTimeout(() => this.promptInput_elem.focus(), 10);
+
+        this.renderSuggestions([]);
+        this.mng_ai_speculative.prefetch(this.state.selectedText).then((prompts) => {
+            if (this.state.commandPalette.isOpen) {
+                this.renderSuggestions(prompts);
+            }
+        });
+    };
+
+    renderSuggestions = (prompts) => {
+        this.promptSuggestions_elem.innerHTML = '';
+        for (const prompt of prompts) {
+            const btn = document.createElement('button');
+            btn.type = 'button';
+            btn.textContent = prompt;
+            btn.dataset.prompt = prompt;
+            btn.className = 'px-2 py-1 text-xs text-gray-700 bg-gray-100 border border-gray-300 rounded hover:bg-gray-200 transition-colors';
+            this.promptSuggestions_elem.appendChild(btn);
+        }
+        this.promptSuggestions_elem.classList.toggle('hidden', prompts.length === 0);
     };
 
     closeCommandPalette = () => {
@@ -675,13 +845,15 @@ class CommandPaletteManager {
         const prompt = this.promptInput_elem.value.trim();
         if (prompt) {
             const command = { id: 'custom', name: 'Custom Prompt', customPrompt: prompt };
+            const prefetched = this.mng_ai_speculative.take(prompt, this.state.selectedText);
             this.closeCommandPalette();
             this.mng_ctx_sel.maintainSelection();
             this.mng_ai_result.executeCommand(
                 command,
                 this.state.selectedText,
                 this.state.selectionStart,
-                this.state.selectionEnd
+                this.state.selectionEnd,
+                prefetched
             );
         }
     };
@@ -690,7 +862,7 @@ class CommandPaletteManager {
     close = () => this.closeCommandPalette();
     isOpen = () => this.state.commandPalette.isOpen;
     getSelectedText = () => this.state.selectedText || '';
-    destroy = () => { this.closeCommandPalette();};
+    destroy = () => { this.mng_ai_speculative.cancel(); this.closeCommandPalette();};
 }
 
 ///////////////////////////////////////////////////////////////////////////////////////
@@ -963,19 +1135,23 @@ class EditorApp {
         aiModal_acceptBtn, aiModal_rerunBtn, aiModal_cancelBtn
     )
     this.mng_ai_modal_result = mng_ai_modal_result;
+    this.mng_ai_speculative  = new AIManagerSpeculative(mng_ai_modal_result);
 
     const commandPalette                           = document.getElementById('commandPalette');
     const commandPalette_selectionPreviewContainer = document.getElementById('selectionPreview');
     const commandPalette_selectionPreview          = document.querySelector('#selectionPreview > div');
     const commandPalette_promptInput               = document.getElementById('promptInput');
+    const commandPalette_promptSuggestions         = document.getElementById('promptSuggestions');
 
     this.mng_cmd_pallete = new CommandPaletteManager(
         mng_ctx_sel,
         mng_ai_modal_result,
+        this.mng_ai_speculative,
         commandPalette,
         commandPalette_promptInput,
         commandPalette_selectionPreview,
         commandPalette_selectionPreviewContainer,
+        commandPalette_promptSuggestions,
     )
   }
 
@@ -1,24 +1,22 @@
-# /// script
-# dependencies = [
-# requires-python = ">=3.10"
-#     python-fasthtml>=0.12.25",
-#     "flask>=3.0.0",
-#     "flask-cors>=4.0.0",
-#     "llm>=0.13.1",
-#     "typer>=0.9.0",
-# ]
-# ///
-
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
 import llm
 import logging
 import os
-import typer
+import re
+import threading
 import uuid
+from collections import OrderedDict, deque
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
+
+from nbedit.documents import (
+    ARCHIVE_FORMATS, IMAGE_EXTENSIONS, archive_format_for, import_archive,
+    iter_export, iter_export_bytes, sanitize_document_name
+)
 
 from fasthtml.common import (
     Html, Head, Title, Meta, Script, Style, Body, Span, H3,
@@ -141,6 +139,8 @@ class DraftIndex:
                 'Examples: "make this more formal", "fix grammar", "simplify", "translate to Spanish"',
                 _class="mt-3 text-xs text-gray-500"
             ),
+            # Filled by the JS prefetcher with the user's most used prompts
+            Div(id="promptSuggestions", _class="hidden mt-3 flex flex-wrap gap-2"),
             _class="p-6"
         )
         # Command palette
@@ -233,7 +233,14 @@ class DraftIndex:
 #############################################################################################
 
 app = Flask(__name__)
-CORS(app)  # Allow cross-origin requests from frontend
+# Allow cross-origin requests from frontend, except the bulk export/import endpoints:
+# any page the writer visits could otherwise read or overwrite the whole write folder
+CORS(app, resources={re.compile(r'/(?!api/(export|import)$).*'): {}})
+
+# Defaults for any way the app is run (nbedit serve, WSGI server, test client);
+# `nbedit serve` overrides them from its options
+app.config['SPECULATIVE_BUDGET'] = 2
+app.config['SPECULATIVE_SLOTS'] = threading.BoundedSemaphore(2)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -303,20 +310,40 @@ def process_text():
         
         # Optional fields
         attempt = data.get('attempt', 1)
+        speculative = bool(data.get('speculative', False))
         context_before = data.get('context', {}).get('before', '')
         context_after = data.get('context', {}).get('after', '')
         
-        logger.info(f"Processing request - Prompt: '{prompt[:50]}...', Text length: {len(text)}")
+        logger.info(f"Processing request - Prompt: '{prompt[:50]}...', Text length: {len(text)}, Speculative: {speculative}")
         
         # Build the full prompt with context
         full_prompt = build_prompt(text, prompt, context_before, context_after)
         
-        # Use LLM to process the text
         model_name = app.config.get('MODEL_NAME', 'gpt-3.5-turbo')
-        model = llm.get_model(model_name)
-        response = model.prompt(full_prompt)
-        
-        result = response.text().strip()
+        if speculative:
+            # Speculative runs are best effort: never queue them behind (or in front of)
+            # prompts the user actually submitted, just refuse when the budget is spent
+            if app.config.get('SPECULATIVE_BUDGET', 0) <= 0:
+                return jsonify({'error': 'Speculative runs are disabled'}), 403
+            if len(text) > app.config.get('SPECULATIVE_MAX_CHARS', 2000):
+                return jsonify({'error': 'Selection too long for speculative run'}), 413
+            speculative_slots = app.config['SPECULATIVE_SLOTS']
+            if not speculative_slots.acquire(blocking=False):
+                return jsonify({'error': 'Speculative budget exhausted'}), 429
+            run_key = (get_user_id(), str(data.get('speculative_id') or uuid.uuid4())[:64])
+            try:
+                result = run_llm_prompt(model_name, full_prompt, speculative_runs.start(run_key))
+            finally:
+                speculative_runs.finish(run_key)
+                speculative_slots.release()
+            if result is None:
+                return jsonify({'error': 'Speculative run cancelled'}), 409
+        else:
+            # Only prompts the user typed or picked count towards the usage stats; reruns
+            # (attempt > 1) mean the first result was rejected, so they don't add to the rank
+            if attempt == 1:
+                prompt_stats.record(get_user_id(), prompt)
+            result = run_llm_prompt(model_name, full_prompt)
         
         return jsonify({
             'id': f"result_{attempt}_{hash(text + prompt) % 10000}",
@@ -324,6 +351,7 @@ def process_text():
             'result': result,
             'prompt': prompt,
             'attempt': attempt,
+            'speculative': speculative,
             'metadata': {
                 'model': model_name,
                 'tokens': len(full_prompt.split()) + len(result.split()),
@@ -338,6 +366,148 @@ def process_text():
             'message': str(e)
         }), 500
 
+def run_llm_prompt(model_name: str, full_prompt: str, cancelled: Optional[threading.Event] = None) -> Optional[str]:
+    """Run the prompt against the configured LLM model and return the stripped text.
+
+    With a cancelled event the response is streamed and dropped (returning None) as soon
+    as the event is set, which stops the generation instead of waiting for it to finish.
+    """
+    model = llm.get_model(model_name)
+    if cancelled is None:
+        return model.prompt(full_prompt).text().strip()
+    if cancelled.is_set():
+        return None
+    chunks = []
+    for chunk in model.prompt(full_prompt):
+        if cancelled.is_set():
+            return None
+        chunks.append(chunk)
+    return ''.join(chunks).strip()
+
+class SpeculativeRuns:
+    """Cancellation flags of in-flight speculative runs, keyed by (user, client run id)"""
+
+    def __init__(self, max_early_cancels: int = 256):
+        self._lock = threading.Lock()
+        self._running = {}
+        self._early_cancels = deque(maxlen=max_early_cancels)  # cancels that beat their run
+
+    def start(self, key: tuple) -> threading.Event:
+        cancelled = threading.Event()
+        with self._lock:
+            if key in self._early_cancels:
+                cancelled.set()
+            self._running[key] = cancelled
+        return cancelled
+
+    def finish(self, key: tuple) -> None:
+        with self._lock:
+            self._running.pop(key, None)
+
+    def cancel(self, key: tuple) -> None:
+        with self._lock:
+            cancelled = self._running.get(key)
+            if cancelled:
+                cancelled.set()
+            else:
+                self._early_cancels.append(key)
+
+class PromptUsageStats:
+    """Thread-safe, in-memory per-user counts of submitted command palette prompts.
+
+    Memory is bounded: the least recently active user and the least used prompt of a user
+    are evicted at the limits, and prompts are truncated to max_chars.
+    """
+
+    def __init__(self, max_users: int = 1000, max_prompts: int = 50, max_chars: int = 200):
+        self.max_users = max_users
+        self.max_prompts = max_prompts
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # user -> {normalized prompt: [uses, last spelling]}
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        return ' '.join(prompt.lower().split())
+
+    def record(self, user: str, prompt: str) -> None:
+        label = prompt.strip()[:self.max_chars]
+        key = self.normalize(label)
+        if not key:
+            return
+        with self._lock:
+            prompts = self._users.pop(user, None)
+            if prompts is None:
+                prompts = {}
+                if len(self._users) >= self.max_users:
+                    self._users.popitem(last=False)
+            self._users[user] = prompts  # most recently active last
+
+            entry = prompts.get(key)
+            if entry is None:
+                if len(prompts) >= self.max_prompts:
+                    del prompts[min(prompts, key=lambda p: prompts[p][0])]
+                entry = prompts[key] = [0, label]
+            entry[0] += 1
+            entry[1] = label
+
+    def top(self, user: str, k: int) -> list:
+        with self._lock:
+            entries = sorted(self._users.get(user, {}).values(), key=lambda e: e[0], reverse=True)
+            return [{'prompt': label, 'count': count} for count, label in entries[:k]]
+
+prompt_stats = PromptUsageStats()
+speculative_runs = SpeculativeRuns()
+
+def get_user_id() -> str:
+    """Identify the writer for prompt stats (client generated id, falling back to address)"""
+    return request.headers.get('X-Nbedit-User', '').strip()[:64] or request.remote_addr or 'anonymous'
+
+@app.route('/api/prompt-suggestions', methods=['GET'])
+def prompt_suggestions():
+    """Top-k most used prompts of the current user, candidates for speculative runs"""
+    try:
+        k = min(max(request.args.get('k', 3, type=int), 0), 10)
+        return jsonify({
+            'suggestions': prompt_stats.top(get_user_id(), k),
+            # How many of the suggestions a client may run speculatively at once
+            'speculative_budget': app.config.get('SPECULATIVE_BUDGET', 0),
+        })
+    except Exception as e:
+        logger.error(f"Error listing prompt suggestions: {e}")
+        return jsonify({'error': 'Failed to list prompt suggestions'}), 500
+
+@app.route('/api/prompt-usage', methods=['POST'])
+def record_prompt_usage():
+    """Count a prompt whose result was served from a speculative run"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'JSON body is required'}), 400
+        prompt = str(data.get('prompt', '')).strip()
+        if not prompt:
+            return jsonify({'error': 'Prompt is required'}), 400
+        prompt_stats.record(get_user_id(), prompt)
+        return jsonify({'success': True})
+    except Exception as e:
+        logger.error(f"Error recording prompt usage: {e}")
+        return jsonify({'error': 'Failed to record prompt usage'}), 500
+
+@app.route('/api/speculative-cancel', methods=['POST'])
+def cancel_speculative_runs():
+    """Stop speculative runs the client no longer needs, freeing their slots"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('ids'), list):
+            return jsonify({'error': 'List of run ids is required'}), 400
+        user = get_user_id()
+        for run_id in data['ids'][:32]:
+            speculative_runs.cancel((user, str(run_id)[:64]))
+        return jsonify({'success': True})
+    except Exception as e:
+        logger.error(f"Error cancelling speculative runs: {e}")
+        return jsonify({'error': 'Failed to cancel speculative runs'}), 500
+
 def build_prompt(text, user_prompt, context_before="", context_after=""):
     """Build the full prompt for the LLM"""
     
@@ -437,20 +607,6 @@ def list_models():
             'message': str(e)
         }), 500
 
-def sanitize_document_name(name: str) -> str:
-    """Sanitize document name for use as folder/file name"""
-    if not name or not name.strip():
-        return None
-    
-    # Remove/replace problematic characters
-    import re
-    sanitized = re.sub(r'[<>:"/\\|?*]', '-', name.strip())
-    sanitized = re.sub(r'\s+', '-', sanitized)  # Replace spaces with hyphens
-    sanitized = sanitized.strip('-')  # Remove leading/trailing hyphens
-    sanitized = sanitized.lower()  # Convert to lowercase for nice URLs
-    
-    return sanitized if sanitized else None
-
 def get_document_folder(document_name: str) -> Path:
     """Get the folder path for a document"""
     write_folder = app.config.get('WRITE_FOLDER')
@@ -533,7 +689,7 @@ def upload_image():
             return jsonify({'error': 'No file selected'}), 400
         
         # Validate file type
-        allowed_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
+        allowed_extensions = IMAGE_EXTENSIONS
         file_ext = Path(file.filename).suffix.lower()
         logger.info(f"File extension: '{file_ext}'")
         if file_ext not in allowed_extensions:
@@ -615,6 +771,81 @@ def save_document():
         logger.error(f"Error saving document: {e}")
         return jsonify({'error': 'Save failed'}), 500
 
+def cross_origin_error(require_header: str = None):
+    """Refuse bulk requests from other origins, or without a header simple requests can't set"""
+    origin = request.headers.get('Origin')
+    if origin and urlparse(origin).netloc != request.host:
+        return jsonify({'error': 'Cross-origin requests are not allowed'}), 403
+    if require_header and request.headers.get(require_header) != '1':
+        return jsonify({'error': f'Header {require_header}: 1 is required'}), 403
+    return None
+
+@app.route('/api/export', methods=['GET'])
+def export_documents():
+    """Stream the write folder (or ?documents=a,b) as a tar or zip archive"""
+    error = cross_origin_error()
+    if error:
+        return error
+    try:
+        write_folder = app.config.get('WRITE_FOLDER')
+        if not write_folder:
+            raise ValueError("Write folder not configured")
+        archive_format = request.args.get('format', 'tar')
+        documents = [d for d in request.args.get('documents', '').split(',') if d.strip()]
+        manifest = request.args.get('manifest', '').lower() in ('1', 'true', 'yes')
+        # Validates the filter and collects file metadata; content is read while streaming
+        chunks = iter_export(write_folder, documents, archive_format, manifest)
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error exporting documents: {e}")
+        return jsonify({'error': 'Export failed'}), 500
+
+    filename = f"nbedit-export-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{archive_format}"
+    return Response(
+        iter_export_bytes(chunks),
+        mimetype=ARCHIVE_FORMATS[archive_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+@app.route('/api/import', methods=['POST'])
+def import_documents():
+    """Import an export archive, uploaded as multipart 'file' or streamed as the raw body (tar)"""
+    # The custom header turns cross-origin form/text posts into preflighted requests,
+    # which fail since this endpoint has no CORS headers
+    error = cross_origin_error(require_header='X-Nbedit-Import')
+    if error:
+        return error
+    try:
+        write_folder = app.config.get('WRITE_FOLDER')
+        if not write_folder:
+            raise ValueError("Write folder not configured")
+        overwrite = request.args.get('overwrite', '').lower() in ('1', 'true', 'yes')
+
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('file')
+            if not upload:
+                return jsonify({'error': 'No archive uploaded'}), 400
+            # Multipart uploads are spooled by werkzeug, so zip archives can seek
+            archive_format = request.args.get('format') or archive_format_for(upload.filename)
+            result = import_archive(upload.stream, write_folder, archive_format, overwrite)
+        elif request.mimetype in (ARCHIVE_FORMATS['tar'], 'application/octet-stream'):
+            # Reading request.files would parse form bodies, so only the raw stream is used here
+            archive_format = request.args.get('format', 'tar')
+            result = import_archive(request.stream, write_folder, archive_format, overwrite)
+        else:
+            return jsonify({'error': 'Send multipart/form-data or an application/x-tar body'}), 415
+
+        return jsonify({'success': not (result['mismatched'] or result['missing']), **result})
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error importing documents: {e}")
+        return jsonify({'error': f'Import failed: {str(e)}'}), 500
+
 def load_system_prompt(file_path: Path) -> str:
     """Load system prompt from markdown file"""
     try:
@@ -622,99 +853,3 @@ def load_system_prompt(file_path: Path) -> str:
     except Exception as e:
         logger.error(f"Error loading system prompt from {file_path}: {e}")
         return ""
-
-#############################################################################################
-##################################### CLI (TYPER) ###########################################
-#############################################################################################
-cli = typer.Typer()
-@cli.command('serve')
-def serve(
-    write_folder: str = typer.Option(
-        ..., # means mandatory
-        "--write-folder", 
-        "-w",
-        help="Path to folder where documents and images will be saved"
-    ),
-    system_prompt: str = typer.Option(
-        None, 
-        "--system-prompt", 
-        "-s",
-        help="Path to markdown file containing system prompt"
-    ),
-    model: str = typer.Option(
-        "gpt-3.5-turbo",
-        "--model",
-        "-m",
-        help="LLM model to use (e.g., gpt-3.5-turbo, gpt-4, claude-3-opus)"
-    ),
-    host: str = typer.Option("127.0.0.1", "--host", help="Host to bind to"),
-    port: int = typer.Option(5000, "--port", help="Port to bind to"),
-    debug: bool = typer.Option(False, "--debug", help="Enable debug mode")
-):
-    """Start the AI Writing Assistant Flask Server"""
-    # Validate and set write folder
-    write_path = Path(write_folder)
-    if not write_path.exists():
-        try:
-            write_path.mkdir(parents=True, exist_ok=True)
-            logger.info(f"Created write folder: {write_path}")
-        except Exception as e:
-            typer.echo(f"Error: Cannot create write folder {write_path}: {e}", err=True)
-            raise typer.Exit(1)
-    elif not write_path.is_dir():
-        typer.echo(f"Error: Write folder path exists but is not a directory: {write_path}", err=True)
-        raise typer.Exit(1)
-    
-    app.config['WRITE_FOLDER'] = write_path.resolve()
-    logger.info(f"Using write folder: {app.config['WRITE_FOLDER']}")
-    
-    # Store model name
-    app.config['MODEL_NAME'] = model
-    logger.info(f"Using model: {app.config['MODEL_NAME']}")
-    
-    # Load system prompt if provided
-    if system_prompt:
-        prompt_path = Path(system_prompt)
-        if prompt_path.exists():
-            app.config['SYSTEM_PROMPT'] = load_system_prompt(prompt_path)
-            logger.info(f"Loaded system prompt from {prompt_path} ({len(app.config['SYSTEM_PROMPT'])} characters)")
-        else:
-            typer.echo(f"Error: System prompt file not found: {prompt_path}", err=True)
-            raise typer.Exit(1)
-    else:
-        app.config['SYSTEM_PROMPT'] = ''
-    
-    print("Starting AI Writing Assistant Flask Server...")
-    print("Available endpoints:")
-    print("  POST /api/process - Process text with AI")
-    print("  GET  /api/health  - Health check")
-    print("  GET  /api/models  - List available models")
-    print("  POST /api/upload-image - Upload images")
-    print("  POST /api/save-document - Save document with frontmatter")
-    print("  GET  /api/validate-name - Validate document name")
-    print(f"\nWrite folder: {app.config['WRITE_FOLDER']}")
-    print(f"Model: {app.config['MODEL_NAME']}")
-    print("\nMake sure to set up your API keys:")
-    print("  export OPENAI_API_KEY=your_key_here")
-    print("  or configure other models with: llm install llm-claude-3")
-    
-    if app.config.get('SYSTEM_PROMPT'):
-        system_prompt_preview = app.config['SYSTEM_PROMPT']
-        print(f"\nUsing system prompt: {system_prompt_preview[:100]}{'...' if len(system_prompt_preview) > 100 else ''}")
-    
-    app.run(debug=debug, host=host, port=port)
-
-@cli.command('api')
-def api(
-    models: bool = typer.Option(
-    False, # no argument
-        "--models",
-        "-m",
-        help="list available models"
-    )):
-        """Non GUI interactions"""
-        for m in llm.get_models():
-            print(getattr(m, 'name', m.model_id))
-
-if __name__ == '__main__':
-    cli()
\ No newline at end of file
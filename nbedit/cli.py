@@ -0,0 +1,272 @@
+import logging
+import sys
+import typer
+from pathlib import Path
+
+# Keep this module light: Flask, flask_cors, llm, werkzeug and FastHTML are imported
+# inside the commands that need them, so e.g. `nbedit api --models` does not pay
+# for the web stack. `nbedit startup-time` guards this.
+
+logger = logging.getLogger(__name__)
+
+# Modules that must not be imported when only loading the CLI
+HEAVY_MODULES = ('flask', 'flask_cors', 'werkzeug', 'llm', 'fasthtml')
+
+# What `nbedit startup-time` imports for each target
+STARTUP_TARGETS = {
+    'cli': 'from nbedit.cli import cli',
+    'serve': 'from nbedit.cli import cli; import nbedit.app',
+}
+
+#############################################################################################
+##################################### CLI (TYPER) ###########################################
+#############################################################################################
+cli = typer.Typer()
+@cli.command('serve')
+def serve(
+    write_folder: str = typer.Option(
+        ..., # means mandatory
+        "--write-folder",
+        "-w",
+        help="Path to folder where documents and images will be saved"
+    ),
+    system_prompt: str = typer.Option(
+        None,
+        "--system-prompt",
+        "-s",
+        help="Path to markdown file containing system prompt"
+    ),
+    model: str = typer.Option(
+        "gpt-3.5-turbo",
+        "--model",
+        "-m",
+        help="LLM model to use (e.g., gpt-3.5-turbo, gpt-4, claude-3-opus)"
+    ),
+    speculative_budget: int = typer.Option(
+        None,
+        "--speculative-budget",
+        help="Max concurrent speculative AI runs for frequently used prompts (0 disables, default 2)"
+    ),
+    host: str = typer.Option("127.0.0.1", "--host", help="Host to bind to"),
+    port: int = typer.Option(5000, "--port", help="Port to bind to"),
+    debug: bool = typer.Option(False, "--debug", help="Enable debug mode")
+):
+    """Start the AI Writing Assistant Flask Server"""
+    # Validate arguments before paying for the web stack imports
+    write_path = Path(write_folder)
+    if not write_path.exists():
+        try:
+            write_path.mkdir(parents=True, exist_ok=True)
+            # Logging is only configured once nbedit.app is imported below
+            typer.echo(f"Created write folder: {write_path}", err=True)
+        except Exception as e:
+            typer.echo(f"Error: Cannot create write folder {write_path}: {e}", err=True)
+            raise typer.Exit(1)
+    elif not write_path.is_dir():
+        typer.echo(f"Error: Write folder path exists but is not a directory: {write_path}", err=True)
+        raise typer.Exit(1)
+
+    prompt_path = Path(system_prompt) if system_prompt else None
+    if prompt_path and not prompt_path.exists():
+        typer.echo(f"Error: System prompt file not found: {prompt_path}", err=True)
+        raise typer.Exit(1)
+
+    import threading
+    from nbedit.app import app, load_system_prompt
+
+    app.config['WRITE_FOLDER'] = write_path.resolve()
+    logger.info(f"Using write folder: {app.config['WRITE_FOLDER']}")
+
+    # Store model name
+    app.config['MODEL_NAME'] = model
+    logger.info(f"Using model: {app.config['MODEL_NAME']}")
+
+    # Speculative prefetch budget, the app keeps its default unless given
+    if speculative_budget is not None:
+        app.config['SPECULATIVE_BUDGET'] = max(speculative_budget, 0)
+        app.config['SPECULATIVE_SLOTS'] = threading.BoundedSemaphore(max(speculative_budget, 1))
+    logger.info(f"Speculative budget: {app.config['SPECULATIVE_BUDGET']}")
+
+    # Load system prompt if provided
+    if prompt_path:
+        app.config['SYSTEM_PROMPT'] = load_system_prompt(prompt_path)
+        logger.info(f"Loaded system prompt from {prompt_path} ({len(app.config['SYSTEM_PROMPT'])} characters)")
+    else:
+        app.config['SYSTEM_PROMPT'] = ''
+
+    print("Starting AI Writing Assistant Flask Server...")
+    print("Available endpoints:")
+    print("  POST /api/process - Process text with AI")
+    print("  GET  /api/health  - Health check")
+    print("  GET  /api/models  - List available models")
+    print("  GET  /api/prompt-suggestions - Most used prompts (speculative prefetch)")
+    print("  POST /api/prompt-usage - Count a prompt served from a speculative run")
+    print("  POST /api/speculative-cancel - Stop speculative runs no longer needed")
+    print("  POST /api/upload-image - Upload images")
+    print("  POST /api/save-document - Save document with frontmatter")
+    print("  GET  /api/export - Stream the write folder as a tar/zip archive")
+    print("  POST /api/import - Import a tar/zip archive into the write folder")
+    print("  GET  /api/validate-name - Validate document name")
+    print(f"\nWrite folder: {app.config['WRITE_FOLDER']}")
+    print(f"Model: {app.config['MODEL_NAME']}")
+    print("\nMake sure to set up your API keys:")
+    print("  export OPENAI_API_KEY=your_key_here")
+    print("  or configure other models with: llm install llm-claude-3")
+
+    if app.config.get('SYSTEM_PROMPT'):
+        system_prompt_preview = app.config['SYSTEM_PROMPT']
+        print(f"\nUsing system prompt: {system_prompt_preview[:100]}{'...' if len(system_prompt_preview) > 100 else ''}")
+
+    app.run(debug=debug, host=host, port=port)
+
+@cli.command('api')
+def api(
+    models: bool = typer.Option(
+    False, # no argument
+        "--models",
+        "-m",
+        help="list available models"
+    )):
+        """Non GUI interactions"""
+        import llm
+        for m in llm.get_models():
+            print(getattr(m, 'name', m.model_id))
+
+@cli.command('export')
+def export(
+    write_folder: str = typer.Option(..., "--write-folder", "-w", help="Folder with the documents to export"),
+    output: str = typer.Option("-", "--output", "-o", help="Archive file to write, '-' for stdout"),
+    archive_format: str = typer.Option(None, "--format", "-f", help="tar or zip (default: from --output suffix, else tar)"),
+    documents: list[str] = typer.Option(None, "--document", "-d", help="Only export this document (repeatable)"),
+    manifest: bool = typer.Option(False, "--manifest", help="Add manifest.json with sha256 of every file (hashes everything before streaming, reading files twice)"),
+):
+    """Stream documents and images into a tar/zip archive"""
+    from nbedit.documents import archive_format_for, iter_export, write_export
+
+    archive_format = archive_format or archive_format_for(output)
+    try:
+        chunks = iter_export(Path(write_folder), documents, archive_format, manifest)
+        out = sys.stdout.buffer if output == '-' else open(output, 'wb')
+    except (ValueError, OSError) as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+
+    try:
+        written = write_export(chunks, out)
+    except OSError as e:
+        if output != '-':
+            # Don't leave a truncated archive behind
+            out.close()
+            Path(output).unlink(missing_ok=True)
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+    if output != '-':
+        out.close()
+        typer.echo(f"Exported {written} bytes to {output}", err=True)
+
+@cli.command('import')
+def import_(
+    archive: str = typer.Argument(..., help="Archive file to import, '-' for stdin (tar only)"),
+    write_folder: str = typer.Option(..., "--write-folder", "-w", help="Folder to import the documents into"),
+    archive_format: str = typer.Option(None, "--format", "-f", help="tar or zip (default: from file suffix, else tar)"),
+    overwrite: bool = typer.Option(False, "--overwrite", help="Replace files that already exist"),
+):
+    """Stream a tar/zip archive made by `nbedit export` into the write folder"""
+    from nbedit.documents import archive_format_for, import_archive
+
+    archive_format = archive_format or archive_format_for(archive)
+    try:
+        if archive == '-':
+            result = import_archive(sys.stdin.buffer, Path(write_folder), archive_format, overwrite)
+        else:
+            with open(archive, 'rb') as src:
+                result = import_archive(src, Path(write_folder), archive_format, overwrite)
+    except (ValueError, OSError) as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+
+    print(f"Imported: {len(result['imported'])}, skipped (exists): {len(result['skipped'])}, rejected: {len(result['rejected'])}")
+    for name in result['rejected']:
+        print(f"  rejected: {name}")
+    if result['manifest']:
+        problems = len(result['mismatched']) + len(result['missing'])
+        print("Manifest: " + (f"{problems} problem(s)" if problems else "verified"))
+    for name in result['mismatched']:
+        print(f"  mismatch (kept existing file): {name}")
+    for name in result['missing']:
+        print(f"  missing from archive: {name}")
+    if result['mismatched'] or result['missing']:
+        raise typer.Exit(1)
+
+#############################################################################################
+##################################### STARTUP BENCHMARK #####################################
+#############################################################################################
+def parse_importtime(stderr: str) -> list:
+    """Parse `python -X importtime` output into (module, self_us, cumulative_us, depth) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header line
+        name_field = fields[2].rstrip()
+        depth = (len(name_field) - len(name_field.lstrip()) - 1) // 2
+        rows.append((name_field.strip(), int(fields[0]), int(fields[1]), depth))
+    return rows
+
+def measure_startup(target: str) -> list:
+    """Import the target in a fresh interpreter with -X importtime and return the parsed rows"""
+    import subprocess
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_TARGETS[target]],
+        capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'import failed')
+    return parse_importtime(completed.stderr)
+
+@cli.command('startup-time')
+def startup_time(
+    target: str = typer.Option("cli", "--target", "-t", help="What to import: cli (lightweight commands) or serve"),
+    runs: int = typer.Option(5, "--runs", "-r", help="Number of fresh interpreters, the fastest one is reported"),
+    top: int = typer.Option(10, "--top", "-n", help="Number of slowest top-level imports to list"),
+    max_ms: float = typer.Option(None, "--max-ms", help="Exit with 1 if total import time exceeds this many ms"),
+):
+    """Report CLI import time (python -X importtime) and check the web stack stays lazy"""
+    if target not in STARTUP_TARGETS:
+        typer.echo(f"Error: Unknown target '{target}', use one of: {', '.join(STARTUP_TARGETS)}", err=True)
+        raise typer.Exit(1)
+
+    best = None
+    for _ in range(max(runs, 1)):
+        try:
+            rows = measure_startup(target)
+        except RuntimeError as e:
+            typer.echo(f"Error: Cannot import target '{target}': {e}", err=True)
+            raise typer.Exit(1)
+        total = sum(cumulative for _, _, cumulative, depth in rows if depth == 0)
+        if best is None or total < best[0]:
+            best = (total, rows)
+    total, rows = best
+
+    print(f"Import time for '{target}' (best of {max(runs, 1)}): {total / 1000:.1f} ms, {len(rows)} modules")
+    print(f"\n{'cumulative [ms]':>16} {'self [ms]':>10}  module")
+    top_level = sorted((row for row in rows if row[3] == 0), key=lambda row: row[2], reverse=True)
+    for name, self_us, cumulative_us, _ in top_level[:top]:
+        print(f"{cumulative_us / 1000:>16.1f} {self_us / 1000:>10.1f}  {name}")
+
+    failed = False
+    if target == 'cli':
+        heavy = sorted({name for name, _, _, _ in rows if name.split('.')[0] in HEAVY_MODULES})
+        if heavy:
+            print(f"\nHeavy modules imported on the CLI path: {', '.join(heavy)}")
+            failed = True
+    if max_ms is not None and total / 1000 > max_ms:
+        print(f"\nTotal import time {total / 1000:.1f} ms exceeds --max-ms {max_ms:.1f} ms")
+        failed = True
+    if failed:
+        raise typer.Exit(1)
+
+if __name__ == '__main__':
+    cli()
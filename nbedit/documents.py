@@ -0,0 +1,375 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import tarfile
+import time
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Stdlib only: used by both the Flask server and the lightweight CLI commands.
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
+ARCHIVE_FORMATS = {'tar': 'application/x-tar', 'zip': 'application/zip'}
+MANIFEST_NAME = 'manifest.json'
+MAX_MANIFEST_BYTES = 64 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+def sanitize_document_name(name: str) -> str:
+    """Sanitize document name for use as folder/file name"""
+    if not name or not name.strip():
+        return None
+
+    # Remove/replace problematic characters
+    sanitized = re.sub(r'[<>:"/\\|?*]', '-', name.strip())
+    sanitized = re.sub(r'\s+', '-', sanitized)  # Replace spaces with hyphens
+    sanitized = sanitized.strip('-')  # Remove leading/trailing hyphens
+    sanitized = sanitized.lower()  # Convert to lowercase for nice URLs
+
+    return sanitized if sanitized else None
+
+def archive_format_for(filename: str, default: str = 'tar') -> str:
+    """Guess the archive format from a file name suffix"""
+    return 'zip' if str(filename).lower().endswith('.zip') else default
+
+#############################################################################################
+##################################### EXPORT ################################################
+#############################################################################################
+def plan_export(write_folder: Path, documents: list = None) -> list:
+    """List (arcname, path, stat) of every file to export, validating the document filter upfront.
+
+    Only metadata is collected here so errors surface before any byte is streamed.
+    """
+    write_folder = Path(write_folder)
+    if documents:
+        names = []
+        for document in documents:
+            sanitized = sanitize_document_name(document)
+            if not sanitized or sanitized.startswith('.'):
+                raise ValueError(f"Invalid document name: {document}")
+            names.append(sanitized)
+        missing = [name for name in names if not (write_folder / name).is_dir()]
+        if missing:
+            raise FileNotFoundError(f"Documents not found: {', '.join(missing)}")
+        folders = [write_folder / name for name in sorted(set(names))]
+    else:
+        folders = sorted(p for p in write_folder.iterdir() if p.is_dir() and not p.name.startswith('.'))
+
+    entries = []
+    for folder in folders:
+        for path in sorted(folder.iterdir()):
+            # Documents are flat folders: index.md plus images, no hidden or nested files
+            if path.name.startswith('.') or path.is_symlink() or not path.is_file():
+                continue
+            entries.append((f"{folder.name}/{path.name}", path, path.stat()))
+    return entries
+
+def _read_chunks(path: Path, size: int):
+    """Yield exactly size bytes of the file in chunks"""
+    read = 0
+    with open(path, 'rb') as src:
+        while read < size:
+            block = src.read(min(CHUNK_SIZE, size - read))
+            if not block:
+                break
+            read += len(block)
+            yield block
+    if read != size:
+        raise OSError(f"{path} changed size during export")
+
+def _check_unchanged(path: Path, st: os.stat_result) -> None:
+    """Raise if the file was modified since it was planned (and possibly hashed)"""
+    current = path.stat()
+    if (current.st_size, current.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+        raise OSError(f"{path} changed during export")
+
+def _manifest_bytes(entries: list) -> bytes:
+    """Hash every file upfront so the manifest can lead the archive.
+
+    This reads all the data twice and nothing is streamed until everything is hashed;
+    the exporters re-check each file's mtime so the archive can't disagree with it.
+    """
+    files = []
+    for arcname, path, st in entries:
+        digest = hashlib.sha256()
+        for block in _read_chunks(path, st.st_size):
+            digest.update(block)
+        _check_unchanged(path, st)
+        files.append({'path': arcname, 'size': st.st_size, 'sha256': digest.hexdigest()})
+    manifest = {
+        'format': 'nbedit-export',
+        'version': 1,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'files': files,
+    }
+    return json.dumps(manifest, indent=2).encode('utf-8')
+
+def _tar_header(arcname: str, size: int, mtime: float) -> bytes:
+    info = tarfile.TarInfo(arcname)
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    return info.tobuf(format=tarfile.PAX_FORMAT, encoding='utf-8', errors='strict')
+
+def _tar_padding(size: int) -> bytes:
+    remainder = size % tarfile.BLOCKSIZE
+    return tarfile.NUL * (tarfile.BLOCKSIZE - remainder) if remainder else b''
+
+def iter_tar_export(entries: list, manifest: bool = False):
+    """Yield a tar archive as bytes chunks and (path, size) file payloads.
+
+    Headers are written by hand instead of through TarFile so file payloads can be
+    handed to the sink untouched (see write_export). The manifest comes first, so an
+    import can verify every file before it replaces anything.
+    """
+    if manifest:
+        data = _manifest_bytes(entries)
+        yield _tar_header(MANIFEST_NAME, len(data), time.time())
+        yield data
+        yield _tar_padding(len(data))
+    for arcname, path, st in entries:
+        _check_unchanged(path, st)
+        yield _tar_header(arcname, st.st_size, st.st_mtime)
+        yield (path, st.st_size)
+        # Resumed once the consumer has copied the payload
+        _check_unchanged(path, st)
+        yield _tar_padding(st.st_size)
+    # End of archive: two zero blocks
+    yield tarfile.NUL * (2 * tarfile.BLOCKSIZE)
+
+class _ChunkSink:
+    """Write-only, unseekable file object collecting what ZipFile writes"""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+def iter_zip_export(entries: list, manifest: bool = False):
+    """Yield a zip archive as bytes chunks, using data descriptors since the sink can't seek"""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w') as zf:
+        if manifest:
+            zf.writestr(MANIFEST_NAME, _manifest_bytes(entries))
+            yield sink.drain()
+        for arcname, path, st in entries:
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime(max(st.st_mtime, 315619200))[:6])
+            # Images are already compressed, deflating them only costs CPU
+            info.compress_type = zipfile.ZIP_STORED if path.suffix.lower() in IMAGE_EXTENSIONS else zipfile.ZIP_DEFLATED
+            info.file_size = st.st_size
+            _check_unchanged(path, st)
+            with zf.open(info, 'w') as dst:
+                for block in _read_chunks(path, st.st_size):
+                    dst.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+                _check_unchanged(path, st)
+            yield sink.drain()
+    yield sink.drain()
+
+def iter_export(write_folder: Path, documents: list = None, archive_format: str = 'tar', manifest: bool = False):
+    """Plan the export and return the chunk iterator for the requested archive format"""
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unsupported archive format: {archive_format}")
+    entries = plan_export(write_folder, documents)
+    logger.info(f"Exporting {len(entries)} files as {archive_format}")
+    if archive_format == 'zip':
+        return iter_zip_export(entries, manifest)
+    return iter_tar_export(entries, manifest)
+
+def _copy_payload(path: Path, size: int, out) -> None:
+    """Copy a file payload to out, with os.sendfile when out is backed by a file descriptor"""
+    copied = 0
+    with open(path, 'rb') as src:
+        try:
+            out_fd = out.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            out_fd = None
+        if out_fd is not None and hasattr(os, 'sendfile'):
+            try:
+                while copied < size:
+                    sent = os.sendfile(out_fd, src.fileno(), copied, size - copied)
+                    if sent == 0:
+                        break
+                    copied += sent
+            except OSError:
+                if copied:
+                    raise
+                # e.g. unsupported descriptor type, fall back to a regular copy
+        if copied < size:
+            src.seek(copied)
+            while copied < size:
+                block = src.read(min(CHUNK_SIZE, size - copied))
+                if not block:
+                    break
+                out.write(block)
+                copied += len(block)
+    if copied != size:
+        raise OSError(f"{path} changed size during export")
+
+def write_export(chunks, out) -> int:
+    """Write export chunks to a binary file object and return the number of bytes written"""
+    written = 0
+    for chunk in chunks:
+        if isinstance(chunk, tuple):
+            path, size = chunk
+            out.flush()  # sendfile writes at the descriptor offset, behind the buffer
+            _copy_payload(path, size, out)
+            written += size
+        elif chunk:
+            out.write(chunk)
+            written += len(chunk)
+    out.flush()
+    return written
+
+def iter_export_bytes(chunks):
+    """Turn export chunks into plain bytes, e.g. for a streamed HTTP response"""
+    for chunk in chunks:
+        if isinstance(chunk, tuple):
+            yield from _read_chunks(*chunk)
+        elif chunk:
+            yield chunk
+
+#############################################################################################
+##################################### IMPORT ################################################
+#############################################################################################
+def _import_target(write_folder: Path, arcname: str):
+    """Map an archive member name to its destination, or None if the name is not acceptable"""
+    parts = arcname.split('/')
+    if len(parts) != 2:
+        return None
+    document, filename = parts
+    sanitized = sanitize_document_name(document)
+    if not sanitized or sanitized.startswith('.'):
+        return None
+    if not filename or filename.startswith('.') or re.search(r'[<>:"\\|?*\x00-\x1f]', filename):
+        return None
+    return write_folder / sanitized / filename
+
+def _load_manifest(src) -> dict:
+    """Parse manifest.json into {path: (size, sha256)}, rejecting anything malformed"""
+    data = src.read(MAX_MANIFEST_BYTES + 1)
+    if len(data) > MAX_MANIFEST_BYTES:
+        raise ValueError("Invalid manifest: too large")
+    manifest = json.loads(data)  # JSONDecodeError/UnicodeDecodeError are ValueErrors
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('files'), list):
+        raise ValueError("Invalid manifest: expected an object with a 'files' list")
+    files = {}
+    for entry in manifest['files']:
+        if not (
+            isinstance(entry, dict)
+            and isinstance(entry.get('path'), str)
+            and isinstance(entry.get('size'), int) and entry['size'] >= 0
+            and isinstance(entry.get('sha256'), str)
+        ):
+            raise ValueError(f"Invalid manifest entry: {entry!r}")
+        files[entry['path']] = (entry['size'], entry['sha256'].lower())
+    return files
+
+def _write_member(src, target: Path, expected: tuple = None) -> bool:
+    """Stream a member into target through a temporary sibling.
+
+    With expected (size, sha256) the target is only replaced when the content matches,
+    so a corrupt member never clobbers the existing file. Returns whether it was written.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(f".{target.name}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(partial, 'wb') as dst:
+            for block in iter(lambda: src.read(CHUNK_SIZE), b''):
+                digest.update(block)
+                size += len(block)
+                dst.write(block)
+        if expected is not None and expected != (size, digest.hexdigest()):
+            return False
+        os.replace(partial, target)
+        return True
+    finally:
+        if partial.exists():
+            partial.unlink()
+
+def _iter_tar_members(fileobj):
+    # 'r|*' reads the archive strictly forward, so any stream works (stdin, request body)
+    with tarfile.open(fileobj=fileobj, mode='r|*') as tar:
+        for member in tar:
+            kind = 'file' if member.isfile() else 'dir' if member.isdir() else 'other'
+            yield member.name, kind, (lambda m=member: tar.extractfile(m))
+
+def _iter_zip_members(fileobj):
+    # SpooledTemporaryFile (e.g. Flask uploads) has no seekable() before Python 3.11
+    if not getattr(fileobj, 'seekable', lambda: hasattr(fileobj, 'seek'))():
+        raise ValueError("Zip archives need a seekable file, stream a tar archive instead")
+    with zipfile.ZipFile(fileobj) as zf:
+        # The central directory is known upfront, so the manifest can always be read first
+        infos = sorted(zf.infolist(), key=lambda i: i.filename != MANIFEST_NAME)
+        for info in infos:
+            yield info.filename, 'dir' if info.is_dir() else 'file', (lambda i=info: zf.open(i))
+
+def import_archive(fileobj, write_folder: Path, archive_format: str = 'tar', overwrite: bool = False) -> dict:
+    """Stream an export archive into the write folder.
+
+    Member names are validated with sanitize_document_name; anything outside the flat
+    <document>/<file> layout is rejected. Existing files are kept unless overwrite is set.
+    When the archive carries a manifest it must come first (as nbedit export writes it):
+    files are then only written if they match it, members it does not list are rejected
+    and entries that never showed up are reported as missing (e.g. a truncated archive).
+    """
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unsupported archive format: {archive_format}")
+    write_folder = Path(write_folder)
+    members = _iter_zip_members(fileobj) if archive_format == 'zip' else _iter_tar_members(fileobj)
+
+    result = {'imported': [], 'skipped': [], 'rejected': [], 'mismatched': [], 'missing': [], 'manifest': False}
+    manifest = None
+    seen = set()
+    try:
+        for name, kind, open_member in members:
+            name = name[2:] if name.startswith('./') else name  # archives made with `tar -C folder .`
+            if name == MANIFEST_NAME:
+                if manifest is not None or seen:
+                    raise ValueError(f"{MANIFEST_NAME} must be the first member of the archive")
+                manifest = _load_manifest(open_member())
+                result['manifest'] = True
+                continue
+            if kind == 'dir':
+                continue  # folders are created from the file names
+            seen.add(name)
+            target = _import_target(write_folder, name) if kind == 'file' else None
+            if target is None or (manifest is not None and name not in manifest):
+                logger.warning(f"Rejected archive member: {name}")
+                result['rejected'].append(name)
+                continue
+            arcname = f"{target.parent.name}/{target.name}"
+            if target.exists() and not overwrite:
+                result['skipped'].append(arcname)
+                continue
+            expected = manifest[name] if manifest is not None else None
+            if _write_member(open_member(), target, expected):
+                result['imported'].append(arcname)
+            else:
+                logger.warning(f"Manifest mismatch, kept existing file: {name}")
+                result['mismatched'].append(name)
+    except (tarfile.TarError, zipfile.BadZipFile) as e:
+        raise ValueError(f"Invalid {archive_format} archive: {e}") from e
+
+    if manifest is not None:
+        result['missing'] = sorted(set(manifest) - seen)
+    logger.info(f"Imported {len(result['imported'])} files, skipped {len(result['skipped'])}, rejected {len(result['rejected'])}")
+    return result
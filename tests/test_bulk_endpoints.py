@@ -0,0 +1,49 @@
+import io
+import tarfile
+
+import pytest
+
+import nbedit.app as server
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setitem(server.app.config, "WRITE_FOLDER", tmp_path)
+    return server.app.test_client()
+
+
+def tar_bytes(name, data):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+IMPORT = {"X-Nbedit-Import": "1"}
+
+
+@pytest.mark.parametrize("content_type", ["application/x-tar", "application/octet-stream"])
+def test_import_raw_tar_body(client, tmp_path, content_type):
+    response = client.post("/api/import", headers=IMPORT, data=tar_bytes("doc/index.md", b"hi"),
+                           content_type=content_type)
+    assert response.status_code == 200
+    assert response.json["imported"] == ["doc/index.md"]
+    assert (tmp_path / "doc" / "index.md").read_bytes() == b"hi"
+
+
+def test_import_multipart_upload(client, tmp_path):
+    data = {"file": (io.BytesIO(tar_bytes("doc/index.md", b"hi")), "backup.tar")}
+    response = client.post("/api/import", headers=IMPORT, data=data, content_type="multipart/form-data")
+    assert response.json["imported"] == ["doc/index.md"]
+    response = client.post("/api/import", headers=IMPORT, data={}, content_type="multipart/form-data")
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("content_type", ["application/x-www-form-urlencoded", "text/plain", None])
+def test_import_rejects_other_bodies(client, tmp_path, content_type):
+    response = client.post("/api/import", headers=IMPORT, data=tar_bytes("doc/index.md", b"hi"),
+                           content_type=content_type)
+    assert response.status_code == 415
+    assert not (tmp_path / "doc").exists()
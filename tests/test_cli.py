@@ -0,0 +1,66 @@
+import subprocess
+import sys
+
+from typer.testing import CliRunner
+
+from nbedit.cli import HEAVY_MODULES, cli, parse_importtime
+
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       167 |        167 |   _io
+import time:        95 |         95 |     encodings.aliases
+import time:       630 |        725 |   encodings
+import time:        12 |         12 |     typer.colors
+import time:       300 |        900 |   typer.main
+import time:      1200 |       2100 | typer
+some unrelated stderr line
+"""
+
+
+def test_parse_importtime():
+    assert parse_importtime(IMPORTTIME_OUTPUT) == [
+        ("_io", 167, 167, 1),
+        ("encodings.aliases", 95, 95, 2),
+        ("encodings", 630, 725, 1),
+        ("typer.colors", 12, 12, 2),
+        ("typer.main", 300, 900, 1),
+        ("typer", 1200, 2100, 0),
+    ]
+
+
+def test_cli_import_stays_light():
+    code = "import sys, nbedit.cli; print(' '.join(sorted(sys.modules)))"
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    loaded = {name.split(".")[0] for name in completed.stdout.split()}
+    assert not loaded & set(HEAVY_MODULES)
+
+
+
+def test_export_rejects_file_as_write_folder(tmp_path):
+    (tmp_path / "file").write_text("x")
+    output = tmp_path / "backup.tar"
+    result = CliRunner().invoke(cli, ["export", "-w", str(tmp_path / "file"), "-o", str(output)])
+    assert result.exit_code == 1
+    assert "Error:" in result.output
+    assert not output.exists()
+
+
+def test_export_failure_removes_partial_output(tmp_path, monkeypatch):
+    import nbedit.documents as documents
+
+    folder = tmp_path / "content"
+    (folder / "doc").mkdir(parents=True)
+    (folder / "doc" / "index.md").write_text("hello")
+    real_copy = documents._copy_payload
+
+    def copy_then_edit(path, size, out):
+        real_copy(path, size, out)
+        path.write_text("edited while exporting")
+
+    monkeypatch.setattr(documents, "_copy_payload", copy_then_edit)
+    output = tmp_path / "backup.tar"
+    result = CliRunner().invoke(cli, ["export", "-w", str(folder), "-o", str(output)])
+    assert result.exit_code == 1
+    assert "changed during export" in result.output
+    assert not output.exists()
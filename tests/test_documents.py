@@ -0,0 +1,240 @@
+import hashlib
+import io
+import json
+import os
+import tarfile
+import tempfile
+import zipfile
+
+import pytest
+
+from nbedit.documents import (
+    MANIFEST_NAME, import_archive, iter_export, iter_export_bytes, plan_export, write_export
+)
+
+
+@pytest.fixture
+def write_folder(tmp_path):
+    folder = tmp_path / "content"
+    (folder / "post-a").mkdir(parents=True)
+    (folder / "post-a" / "index.md").write_text("---\ntitle: a\n---\nhello")
+    (folder / "post-a" / "image.png").write_bytes(bytes(range(256)) * 2000)
+    (folder / "post-a" / ".draft.swp").write_text("hidden")
+    (folder / "post-b").mkdir()
+    (folder / "post-b" / "index.md").write_text("b")
+    (folder / ".git").mkdir()
+    (folder / ".git" / "config").write_text("x")
+    return folder
+
+
+def make_tar(members):
+    """Build a tar from (name, bytes) pairs; bytes None adds a symlink"""
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            if data is None:
+                info.type = tarfile.SYMTYPE
+                info.linkname = "/etc/passwd"
+                tar.addfile(info)
+            else:
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+    buf.seek(0)
+    return buf
+
+
+def manifest_for(files):
+    return json.dumps({"files": [
+        {"path": path, "size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+        for path, data in files
+    ]}).encode()
+
+
+def folder_contents(folder):
+    return {
+        f"{p.parent.name}/{p.name}": p.read_bytes()
+        for p in sorted(folder.glob("*/*")) if not p.name.startswith(".") and not p.parent.name.startswith(".")
+    }
+
+
+@pytest.mark.parametrize("archive_format", ["tar", "zip"])
+@pytest.mark.parametrize("manifest", [False, True])
+def test_roundtrip(write_folder, tmp_path, archive_format, manifest):
+    archive = tmp_path / f"export.{archive_format}"
+    with open(archive, "wb") as out:
+        written = write_export(iter_export(write_folder, None, archive_format, manifest), out)
+    assert written == archive.stat().st_size
+
+    streamed = b"".join(iter_export_bytes(iter_export(write_folder, None, archive_format, manifest)))
+    if not manifest:  # the manifest carries a timestamp
+        assert streamed == archive.read_bytes()
+
+    if archive_format == "tar":
+        names = tarfile.open(archive).getnames()
+    else:
+        names = zipfile.ZipFile(archive).namelist()
+    expected = ["post-a/image.png", "post-a/index.md", "post-b/index.md"]
+    assert names == ([MANIFEST_NAME] if manifest else []) + expected
+
+    for source in (open(archive, "rb"), io.BytesIO(streamed)):
+        target = tmp_path / f"import-{id(source)}"
+        with source:
+            result = import_archive(source, target, archive_format)
+        assert result["imported"] == expected
+        assert result["manifest"] is manifest
+        assert not (result["rejected"] or result["mismatched"] or result["missing"])
+        assert folder_contents(target) == folder_contents(write_folder)
+
+
+def test_write_export_without_file_descriptor(write_folder, tmp_path):
+    archive = tmp_path / "export.tar"
+    with open(archive, "wb") as out:
+        write_export(iter_export(write_folder), out)
+    buf = io.BytesIO()  # no fileno(): falls back to a regular copy
+    write_export(iter_export(write_folder), buf)
+    assert buf.getvalue() == archive.read_bytes()
+
+
+def test_write_export_uses_sendfile(write_folder, tmp_path, monkeypatch):
+    calls = []
+    real_sendfile = os.sendfile
+
+    def spy(*args):
+        calls.append(args)
+        return real_sendfile(*args)
+
+    monkeypatch.setattr(os, "sendfile", spy, raising=False)
+    with open(tmp_path / "export.tar", "wb") as out:
+        write_export(iter_export(write_folder), out)
+    assert len(calls) >= 3  # one per file payload
+
+
+def test_write_export_falls_back_when_sendfile_fails(write_folder, tmp_path, monkeypatch):
+    with open(tmp_path / "expected.tar", "wb") as out:
+        write_export(iter_export(write_folder), out)
+
+    def broken(*args):
+        raise OSError("sendfile not supported")
+
+    monkeypatch.setattr(os, "sendfile", broken, raising=False)
+    with open(tmp_path / "export.tar", "wb") as out:
+        write_export(iter_export(write_folder), out)
+    assert (tmp_path / "export.tar").read_bytes() == (tmp_path / "expected.tar").read_bytes()
+
+
+def test_export_filter(write_folder):
+    assert [a for a, _, _ in plan_export(write_folder, ["Post A"])] == ["post-a/image.png", "post-a/index.md"]
+    with pytest.raises(ValueError):
+        plan_export(write_folder, [".."])
+    with pytest.raises(FileNotFoundError):
+        plan_export(write_folder, ["nope"])
+
+
+@pytest.mark.parametrize("name", [
+    "../x", "../../etc/x", "/abs", "/abs/index.md", "a/b/c", "../index.md",
+    ".git/config", "doc/.htaccess", "doc/", "..", "doc/a:b",
+])
+def test_import_rejects_unsafe_names(tmp_path, name):
+    result = import_archive(make_tar([(name, b"x")]), tmp_path / "content")
+    assert result["rejected"] == [name]
+    assert result["imported"] == []
+    assert not any(tmp_path.rglob("x")) and not (tmp_path / "index.md").exists()
+
+
+def test_import_rejects_symlinks(tmp_path):
+    result = import_archive(make_tar([("doc/link", None)]), tmp_path / "content")
+    assert result["rejected"] == ["doc/link"]
+    assert not (tmp_path / "content" / "doc" / "link").exists()
+
+
+def test_import_sanitizes_document_names(tmp_path):
+    result = import_archive(make_tar([("./My Post/index.md", b"x")]), tmp_path)
+    assert result["imported"] == ["my-post/index.md"]
+
+
+def test_import_skips_existing_unless_overwrite(tmp_path):
+    (tmp_path / "doc").mkdir()
+    (tmp_path / "doc" / "index.md").write_bytes(b"ORIGINAL")
+
+    result = import_archive(make_tar([("doc/index.md", b"new"), ("doc/a.png", b"png")]), tmp_path)
+    assert result["skipped"] == ["doc/index.md"]
+    assert result["imported"] == ["doc/a.png"]
+    assert (tmp_path / "doc" / "index.md").read_bytes() == b"ORIGINAL"
+
+    result = import_archive(make_tar([("doc/index.md", b"new")]), tmp_path, overwrite=True)
+    assert result["imported"] == ["doc/index.md"]
+    assert (tmp_path / "doc" / "index.md").read_bytes() == b"new"
+    assert not list(tmp_path.glob("doc/.*.part"))
+
+
+def test_manifest_mismatch_keeps_existing_file(tmp_path):
+    (tmp_path / "doc").mkdir()
+    (tmp_path / "doc" / "index.md").write_bytes(b"ORIGINAL")
+    manifest = manifest_for([("doc/index.md", b"good")])
+
+    archive = make_tar([(MANIFEST_NAME, manifest), ("doc/index.md", b"corrupt")])
+    result = import_archive(archive, tmp_path, overwrite=True)
+    assert result["mismatched"] == ["doc/index.md"]
+    assert result["imported"] == []
+    assert (tmp_path / "doc" / "index.md").read_bytes() == b"ORIGINAL"
+    assert not list(tmp_path.glob("doc/.*.part"))
+
+
+def test_manifest_reports_missing_and_unlisted_members(tmp_path):
+    files = [("doc/index.md", b"a"), ("doc/b.png", b"b")]
+    archive = make_tar([(MANIFEST_NAME, manifest_for(files)), files[0], ("doc/extra.png", b"x")])
+    result = import_archive(archive, tmp_path)
+    assert result["imported"] == ["doc/index.md"]
+    assert result["rejected"] == ["doc/extra.png"]
+    assert result["missing"] == ["doc/b.png"]
+
+
+def test_truncated_tar_reports_missing(write_folder, tmp_path):
+    data = b"".join(iter_export_bytes(iter_export(write_folder, manifest=True)))
+    # Cut the archive right after the second member (manifest + first file + its padding)
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        members = tar.getmembers()
+    cut = members[2].offset
+    result = import_archive(io.BytesIO(data[:cut]), tmp_path / "restored")
+    assert result["imported"] == ["post-a/image.png"]
+    assert result["missing"] == ["post-a/index.md", "post-b/index.md"]
+
+
+@pytest.mark.parametrize("manifest", [b"[]", b"{}", b'{"files": [1]}', b'{"files": [{"path": "a"}]}', b"not json"])
+def test_malformed_manifest_is_value_error(tmp_path, manifest):
+    with pytest.raises(ValueError):
+        import_archive(make_tar([(MANIFEST_NAME, manifest)]), tmp_path)
+
+
+def test_manifest_must_come_first(tmp_path):
+    archive = make_tar([("doc/index.md", b"a"), (MANIFEST_NAME, manifest_for([("doc/index.md", b"a")]))])
+    with pytest.raises(ValueError):
+        import_archive(archive, tmp_path)
+
+
+def test_invalid_archives_are_value_errors(tmp_path):
+    with pytest.raises(ValueError):
+        import_archive(io.BytesIO(b"garbage" * 100), tmp_path)
+    with pytest.raises(ValueError):
+        import_archive(io.BytesIO(b"garbage" * 100), tmp_path, "zip")
+
+
+def test_zip_import_from_spooled_upload(write_folder, tmp_path):
+    # Flask spools multipart uploads into a SpooledTemporaryFile
+    with tempfile.SpooledTemporaryFile() as upload:
+        write_export(iter_export(write_folder, None, "zip", manifest=True), upload)
+        upload.seek(0)
+        result = import_archive(upload, tmp_path / "restored", "zip")
+    assert result["imported"] == ["post-a/image.png", "post-a/index.md", "post-b/index.md"]
+
+
+@pytest.mark.parametrize("archive_format", ["tar", "zip"])
+def test_file_changed_after_hashing_aborts_export(write_folder, archive_format):
+    chunks = iter_export(write_folder, None, archive_format, manifest=True)
+    next(chunks)  # the manifest is hashed before the first chunk
+    index = write_folder / "post-a" / "index.md"
+    st = index.stat()
+    os.utime(index, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    with pytest.raises(OSError, match="changed during export"):
+        b"".join(iter_export_bytes(chunks))
@@ -0,0 +1,185 @@
+import threading
+
+import pytest
+
+import nbedit.app as server
+from nbedit.app import PromptUsageStats, SpeculativeRuns, run_llm_prompt
+
+
+class FakeModel:
+    """Streams chunks, optionally setting an event after a number of them"""
+
+    def __init__(self, chunks=("Hello ", "world"), set_after=None, event=None):
+        self.chunks = chunks
+        self.set_after = set_after
+        self.event = event
+        self.served = 0
+        self.prompts = []
+
+    def prompt(self, full_prompt):
+        self.prompts.append(full_prompt)
+        model = self
+
+        class Response:
+            def __iter__(self):
+                for chunk in model.chunks:
+                    if model.set_after is not None and model.served == model.set_after:
+                        model.event.set()
+                    model.served += 1
+                    yield chunk
+
+            def text(self):
+                return ''.join(model.chunks)
+
+        return Response()
+
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = FakeModel()
+    monkeypatch.setattr(server.llm, 'get_model', lambda name: fake)
+    return fake
+
+
+@pytest.fixture
+def client(monkeypatch, model):
+    monkeypatch.setattr(server, 'prompt_stats', PromptUsageStats())
+    monkeypatch.setattr(server, 'speculative_runs', SpeculativeRuns())
+    monkeypatch.setitem(server.app.config, 'SPECULATIVE_BUDGET', 1)
+    monkeypatch.setitem(server.app.config, 'SPECULATIVE_SLOTS', threading.BoundedSemaphore(1))
+    return server.app.test_client()
+
+
+USER = {'X-Nbedit-User': 'writer'}
+
+
+def speculative(client, text='some text', run_id='run-1'):
+    return client.post('/api/process', headers=USER, json={
+        'text': text, 'prompt': 'tighten', 'speculative': True, 'speculative_id': run_id,
+    })
+
+
+def slot_is_free():
+    slots = server.app.config['SPECULATIVE_SLOTS']
+    if slots.acquire(blocking=False):
+        slots.release()
+        return True
+    return False
+
+
+def test_stats_evict_least_recently_active_user():
+    stats = PromptUsageStats(max_users=2)
+    stats.record('a', 'p')
+    stats.record('b', 'p')
+    stats.record('a', 'p')  # a is now the most recently active
+    stats.record('c', 'p')
+    assert stats.top('b', 5) == []
+    assert stats.top('a', 5) == [{'prompt': 'p', 'count': 2}]
+    assert stats.top('c', 5) == [{'prompt': 'p', 'count': 1}]
+
+
+def test_stats_evict_least_used_prompt():
+    stats = PromptUsageStats(max_prompts=2)
+    for prompt in ['tighten', 'tighten', 'fix grammar', 'simplify']:
+        stats.record('a', prompt)
+    assert stats.top('a', 5) == [{'prompt': 'tighten', 'count': 2}, {'prompt': 'simplify', 'count': 1}]
+
+
+def test_stats_truncate_and_normalize_labels():
+    stats = PromptUsageStats(max_chars=10)
+    stats.record('a', '  Make It Friendlier please ')
+    stats.record('a', 'make it friendlier')
+    assert stats.top('a', 5) == [{'prompt': 'make it fr', 'count': 2}]  # last spelling wins
+    stats.record('a', '   ')
+    assert len(stats.top('a', 5)) == 1
+
+
+def test_early_cancel_applies_to_later_run():
+    runs = SpeculativeRuns()
+    runs.cancel(('writer', 'run-1'))
+    assert runs.start(('writer', 'run-1')).is_set()
+    assert not runs.start(('other', 'run-1')).is_set()
+
+
+def test_cancel_running_run():
+    runs = SpeculativeRuns()
+    cancelled = runs.start(('writer', 'run-1'))
+    runs.cancel(('writer', 'run-1'))
+    assert cancelled.is_set()
+
+
+def test_run_llm_prompt_stops_mid_stream(model):
+    cancelled = threading.Event()
+    model.chunks = [f"w{i} " for i in range(10)]
+    model.set_after, model.event = 2, cancelled
+    assert run_llm_prompt('fake', 'prompt', cancelled) is None
+    assert model.served == 3  # stopped right after the chunk that saw the cancel
+
+
+def test_run_llm_prompt(model):
+    assert run_llm_prompt('fake', 'prompt') == 'Hello world'
+    assert run_llm_prompt('fake', 'prompt', threading.Event()) == 'Hello world'
+    cancelled = threading.Event()
+    cancelled.set()
+    assert run_llm_prompt('fake', 'prompt', cancelled) is None
+
+
+def test_speculative_disabled(client, monkeypatch):
+    monkeypatch.setitem(server.app.config, 'SPECULATIVE_BUDGET', 0)
+    assert speculative(client).status_code == 403
+
+
+def test_speculative_long_selection(client):
+    assert speculative(client, text='x' * 5000).status_code == 413
+
+
+def test_speculative_no_free_slot(client):
+    slots = server.app.config['SPECULATIVE_SLOTS']
+    assert slots.acquire(blocking=False)
+    try:
+        assert speculative(client).status_code == 429
+    finally:
+        slots.release()
+
+
+def test_speculative_run_releases_slot(client, model):
+    response = speculative(client)
+    assert response.status_code == 200
+    assert response.json['result'] == 'Hello world'
+    assert slot_is_free()
+
+
+def test_cancelled_speculative_run_releases_slot(client):
+    client.post('/api/speculative-cancel', headers=USER, json={'ids': ['run-1']})
+    assert speculative(client).json == {'error': 'Speculative run cancelled'}
+    assert slot_is_free()
+
+
+def test_failing_speculative_run_releases_slot(client, monkeypatch):
+    def broken(name):
+        raise RuntimeError('model unavailable')
+
+    monkeypatch.setattr(server.llm, 'get_model', broken)
+    assert speculative(client).status_code == 500
+    assert slot_is_free()
+
+
+def test_only_first_attempts_count(client):
+    for attempt in (1, 2, 3):
+        client.post('/api/process', headers=USER, json={'text': 't', 'prompt': 'tighten', 'attempt': attempt})
+    speculative(client)
+    suggestions = client.get('/api/prompt-suggestions', headers=USER).json
+    assert suggestions == {'suggestions': [{'prompt': 'tighten', 'count': 1}], 'speculative_budget': 1}
+
+
+def test_prompt_usage(client):
+    assert client.post('/api/prompt-usage', headers=USER, data='x').status_code == 400
+    assert client.post('/api/prompt-usage', headers=USER, json=[]).status_code == 400
+    assert client.post('/api/prompt-usage', headers=USER, json={'prompt': ''}).status_code == 400
+    assert client.post('/api/prompt-usage', headers=USER, json={'prompt': 'tighten'}).status_code == 200
+    assert server.prompt_stats.top('writer', 1) == [{'prompt': 'tighten', 'count': 1}]
+
+
+def test_speculative_cancel_requires_ids(client):
+    assert client.post('/api/speculative-cancel', headers=USER, json={}).status_code == 400
+    assert client.post('/api/speculative-cancel', headers=USER, data='x').status_code == 400